@@ -1,6 +1,13 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from main import answer_query, main as setup_embeddings
+from main import answer_query, ingest as setup_embeddings
+from sessions import session_store
+from batch import answer_batch, load_questions, clamp_workers, BATCH_WORKERS
+from vector_store import storage_stats, VECTOR_STORE_MODE
+from main import transcribe_audio
+from model_residency import residency_manager
+from generation_load import generation_load
+from deployment import acquire_ingest_lock, index_watcher
 import threading
 import os
 import psutil
@@ -12,9 +19,14 @@ import pynvml  # For NVIDIA GPU monitoring
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})  # Allow all origins for development
 
-# Initialize embeddings in a separate thread
-print("Setting up embeddings...")
-threading.Thread(target=setup_embeddings).start()
+# Initialize embeddings in a separate thread, lekin sirf us process mein jisko ingest lock mila.
+# Baaki workers leader ka banaya index read-only padhte hain aur generation badalne pe reload karte hain.
+if acquire_ingest_lock():
+    print("Setting up embeddings...")
+    threading.Thread(target=setup_embeddings).start()
+else:
+    print("Worker mode: using the index built by the ingest leader")
+    index_watcher.check()
 
 # Initialize NVML
 try:
@@ -172,6 +184,18 @@ def system_stats():
 def get_stats_history():
     return jsonify(list(stats_history))
 
+@app.route('/model-status')
+def model_status():
+    # Kaunsa model abhi RAM mein hai, aur pichli warm-up kitni der mein hui
+    status = residency_manager.status()
+    status['generation_load'] = dict(generation_load.status(), estimated_wait=round(generation_load.estimated_wait(), 3))
+    return jsonify(status)
+
+@app.route('/index-stats')
+def index_stats():
+    # Har storage mode (float32/float16/int8) kitni RAM aur disk khata hai
+    return jsonify({'mode': VECTOR_STORE_MODE, 'modes': storage_stats()})
+
 @app.route('/chat', methods=['POST'])
 def chat():
     data = request.get_json()
@@ -179,13 +203,52 @@ def chat():
         return jsonify({'error': 'No question provided'}), 400
     
     try:
-        answer = answer_query(data['question'])
+        # Naya session banao ya purana uthao, follow-up sawaalon ke liye Ollama ka context wahi rehta hai
+        # Load balancer X-Session-Id header pe sticky routing karta hai, isliye wahan se bhi id le lo
+        session_id, _ = session_store.get_or_create(data.get('session_id') or request.headers.get('X-Session-Id'))
+        answer = answer_query(data['question'], session_id=session_id)
         return jsonify({
             'answer': answer,
+            'session_id': session_id,
             'peak_stats': peak_stats
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    # JSON array/{"questions": [...]} body, ya phir 'file' mein JSONL upload
+    try:
+        if 'file' in request.files:
+            questions = load_questions(request.files['file'].read().decode('utf-8'))
+            options = request.form
+        else:
+            data = request.get_json()
+            questions = load_questions(json.dumps(data)) if data is not None else []
+            options = data if isinstance(data, dict) else {}
+    except (ValueError, KeyError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Invalid questions payload: {str(e)}'}), 400
+
+    if not questions:
+        return jsonify({'error': 'No questions provided'}), 400
+
+    try:
+        workers = int(options.get('workers', BATCH_WORKERS))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'workers must be an integer'}), 400
+    if workers < 1:
+        return jsonify({'error': 'workers must be at least 1'}), 400
+    workers = clamp_workers(workers)
+    ordered = str(options.get('ordered', 'true')).lower() != 'false'
+
+    def generate():
+        try:
+            for i, question, answer in answer_batch(questions, workers=workers, ordered=ordered):
+                yield json.dumps({'index': i, 'question': question, 'answer': answer}) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
     
 @app.route('/transcribe', methods=['POST'])
 def transcribe():
@@ -381,6 +444,10 @@ def home():
                 let monitoring = false;
                 let lastPeakStats = null;
                 let updateInterval;
+                // Session id browser mein hi banta hai taaki pehla sawaal bhi usi worker pe jaaye jahan follow-ups jayenge
+                let sessionId = (window.crypto && crypto.randomUUID)
+                    ? crypto.randomUUID().replace(/-/g, '')
+                    : Array.from({length: 32}, () => Math.floor(Math.random() * 16).toString(16)).join('');
 
                 // Initialize plots
                 Plotly.newPlot('cpuChart', [cpuData], {
@@ -519,8 +586,9 @@ def home():
                             method: 'POST',
                             headers: {
                                 'Content-Type': 'application/json',
+                                'X-Session-Id': sessionId,
                             },
-                            body: JSON.stringify({question: question})
+                            body: JSON.stringify({question: question, session_id: sessionId})
                         });
                         
                         const data = await response.json();
@@ -531,6 +599,7 @@ def home():
                             answerDiv.textContent = data.error;
                         } else {
                             answerDiv.textContent = data.answer;
+                            sessionId = data.session_id || sessionId;
                             if (data.peak_stats) {
                                 updatePeakStats(data.peak_stats);
                             }
@@ -616,4 +685,4 @@ def home():
     """
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False) 
\ No newline at end of file
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)), debug=False) 
\ No newline at end of file
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from context_packer import pack_context
+from faculty_index import answer_directory_query
+from faq_intents import match_faq
+from main import correct_prompt, generate_answer, get_embeddings, passes_relevance, query_index
+from relevance_gate import gate_query
+from model_residency import residency_manager
+from deployment import index_watcher
+
+# Ollama ek time pe kitne generate requests sambhalega, CPU box pe zyada workers se sirf queue lambi hoti hai
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+# Client kitne bhi workers maange, Ollama pe is se zyada parallel requests nahi bhejenge
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+
+
+def clamp_workers(workers):
+    return max(1, min(int(workers), BATCH_MAX_WORKERS))
+
+
+def load_questions(text):
+    """Parse a JSON array or JSONL text into a list of questions (plain strings or {"question": ...} objects)."""
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        items = json.loads(text)
+        if isinstance(items, dict):
+            items = items["questions"] if "questions" in items else [items]
+        elif not isinstance(items, list):
+            items = [items]
+    except ValueError:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [item["question"] if isinstance(item, dict) else str(item) for item in items]
+
+
+def _generate(prompt, documents):
+    try:
+        context, _ = pack_context(prompt, documents)
+        answer = generate_answer(prompt, context)
+        if answer is None:
+            return "Sorry, I couldn't generate a response at the moment"
+        return answer
+    except Exception as e:
+        return f"Error ho gaya bhai: {str(e)} huihuihi"
+
+
+def answer_batch(questions, workers=BATCH_WORKERS, ordered=True):
+    """
+    Answer many questions at once, yielding (index, question, answer) tuples.
+
+    All questions are embedded in one batched call and searched with a single
+    multi-query index lookup; only the Mistral generations run in the worker
+    pool. With ordered=False results are yielded as soon as they complete.
+    """
+    index_watcher.check()
+    resolved = {}
+
+    # Directory wale sawaal embedding se pehle hi nipta do
+    pending = []
+    for i, question in enumerate(questions):
+        directory_answer = answer_directory_query(question)
+        if directory_answer:
+            resolved[i] = directory_answer
+        else:
+            pending.append(i)
+
+    to_generate = {}
+    if pending:
+        embeddings = get_embeddings([questions[i] for i in pending])
+        searchable = []
+        for i, embedding in zip(pending, embeddings):
+            if embedding is None:
+                resolved[i] = "Sorry, I couldn't process your question at the moment"
+                continue
+            faq_match = match_faq(embedding, questions[i])
+            if faq_match:
+                resolved[i] = faq_match[1]
+                continue
+            # Calibrated centroid gate ho toh off-topic wale yahin ruk jaate hain
+            gate = gate_query(embedding)
+            if gate is not None and not gate[0]:
+                resolved[i] = "I don't know about that, ask me about GBU"
+                continue
+            searchable.append((i, embedding, gate is not None))
+
+        if searchable:
+            results = query_index([embedding for _, embedding, _ in searchable], n_results=3)
+            all_documents = results.get("documents") or [[] for _ in searchable]
+            all_distances = results.get("distances") or [[1] for _ in searchable]
+            for (i, _, gated), documents, distances in zip(searchable, all_documents, all_distances):
+                if not documents or (not gated and not passes_relevance(correct_prompt(questions[i]), documents, distances)):
+                    resolved[i] = "I don't know about that, ask me about GBU"
+                else:
+                    to_generate[i] = documents
+
+    with ThreadPoolExecutor(max_workers=clamp_workers(workers)) as pool:
+        futures = {i: pool.submit(_generate, questions[i], documents) for i, documents in to_generate.items()}
+
+        if ordered:
+            for i, question in enumerate(questions):
+                yield i, question, resolved[i] if i in resolved else futures[i].result()
+            return
+
+        for i in sorted(resolved):
+            yield i, questions[i], resolved[i]
+        index_of = {future: i for i, future in futures.items()}
+        for future in as_completed(index_of):
+            i = index_of[future]
+            yield i, questions[i], future.result()
+
+
+def run_cli(argv=None):
+    # main import hote hi stderr DummyFile pe chala jaata hai; CLI ke argparse/IO errors dikhne chahiye
+    sys.stderr = sys.__stderr__
+    parser = argparse.ArgumentParser(description="Answer a JSON array or JSONL file of questions about GBU.")
+    parser.add_argument("input", help="JSON array or JSONL file of questions ('-' for stdin)")
+    # stdout pe pipeline ke apne logs bhi aate hain, isliye results alag file mein
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to write results to")
+    parser.add_argument("-w", "--workers", type=int, default=BATCH_WORKERS, help="parallel generation workers")
+    parser.add_argument("--unordered", action="store_true", help="emit results as they complete")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.input == "-":
+            questions = load_questions(sys.stdin.read())
+        else:
+            with open(args.input, "r", encoding="utf-8") as file:
+                questions = load_questions(file.read())
+    except (OSError, ValueError, KeyError) as e:
+        parser.exit(1, f"❌ Could not read questions from {args.input}: {str(e)}\n")
+
+    # Batch sirf text hai, Whisper load karne ki zaroorat nahi
+    residency_manager.start(whisper=False)
+    try:
+        with open(args.output, "w", encoding="utf-8") as out:
+            for i, question, answer in answer_batch(questions, workers=args.workers, ordered=not args.unordered):
+                out.write(json.dumps({"index": i, "question": question, "answer": answer}, ensure_ascii=False) + "\n")
+                out.flush()
+    except OSError as e:
+        parser.exit(1, f"❌ Could not write results to {args.output}: {str(e)}\n")
+    print(f"✅ {len(questions)} answers written to {args.output}")
+
+
+if __name__ == "__main__":
+    run_cli()
@@ -0,0 +1,168 @@
+import os
+import re
+
+import tiktoken
+from rapidfuzz import fuzz
+
+# Prompt ka context kitna bada ho sakta hai (tokens mein), CPU pe prefill sasta nahi hai
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1024"))
+# Snippet mode mein ek "sentence" kabhi poora faculty block hota hai, isliye best match ke aas-paas itne shabd hi
+SNIPPET_MAX_WORDS = int(os.getenv("SNIPPET_MAX_WORDS", "40"))
+# Ollama ko yahi num_ctx bhejte hain (Mistral ka default 2048); answer ke liye itne tokens khaali rakhne hain
+GENERATION_NUM_CTX = int(os.getenv("GENERATION_NUM_CTX", "2048"))
+ANSWER_TOKEN_RESERVE = int(os.getenv("ANSWER_TOKEN_RESERVE", "384"))
+# Is se zyada milte-julte sentences duplicate maane jayenge
+DUPLICATE_THRESHOLD = int(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "90"))
+
+# Mistral ka apna tokenizer tiktoken mein nahi hai, cl100k_base se kaafi close estimate mil jata hai
+_encoding = None
+
+# chunk_text() newlines hata deta hai, isliye sentence ke saath bullets (" - ", " * ") pe bhi todte hain
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\s+[-*]\s+")
+# "Prof. Rana Pratap Singh" jaise naam beech se na tootein, in ke baad ka fragment agle se jod dete hain
+_ABBREVIATIONS = {"dr", "prof", "mr", "mrs", "ms", "no", "st", "sr", "jr", "vs", "etc", "e.g", "i.e", "approx", "dept", "govt", "hon", "smt", "shri"}
+_ABBREVIATION_END = re.compile(r"(?:^|[\s(])([a-z.]+)\.$", re.IGNORECASE)
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # Offline box pe BPE file download nahi ho payegi, tab word count se kaam chalayenge
+            print(f"⚠️ tiktoken encoding load nahi hua, estimate use kar rahe hain: {str(e)}")
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    """Approximate token count of text for the generation prompt."""
+    encoding = _get_encoding()
+    if not encoding:
+        return int(len(text.split()) * 1.3) + 1
+    return len(encoding.encode(text))
+
+
+def _ends_with_abbreviation(fragment):
+    match = _ABBREVIATION_END.search(fragment)
+    if not match:
+        return False
+    word = match.group(1)
+    # "B.R." jaise initials bhi naam ka hissa hain
+    return word.lower() in _ABBREVIATIONS or all(len(part) == 1 and part.isupper() for part in word.split("."))
+
+
+def split_sentences(text):
+    sentences = []
+    pending = ""
+    parts = re.split("(" + _SENTENCE_SPLIT.pattern + ")", text)
+    # parts = [fragment, separator, fragment, separator, ..., fragment]
+    for fragment, separator in zip(parts[::2], parts[1::2] + [""]):
+        pending += fragment
+        # Sirf whitespace wala split abbreviation ke baad ho toh sentence abhi khatam nahi hua
+        if separator and not separator.strip() and _ends_with_abbreviation(pending):
+            pending += " "
+            continue
+        if len(pending.strip()) > 2:
+            sentences.append(pending.strip())
+        pending = ""
+    return sentences
+
+
+def _is_duplicate(sentence, kept, threshold):
+    return any(fuzz.token_set_ratio(sentence, other) >= threshold for other in kept)
+
+
+def pack_context(question, documents, token_budget=CONTEXT_TOKEN_BUDGET, duplicate_threshold=DUPLICATE_THRESHOLD, seen=None):
+    """
+    Pack retrieved chunks into a deduplicated context that fits token_budget.
+
+    Sentences are scored against the question and the best ones are kept until the
+    budget runs out; the survivors are emitted in their original retrieval order,
+    one per line. Sentences in `seen` (already sent earlier in a session) are skipped.
+    Returns (context, context_token_count).
+    """
+    candidates = []
+    kept_texts = []
+    for doc_rank, doc in enumerate(documents):
+        for position, sentence in enumerate(split_sentences(doc)):
+            if seen and sentence in seen:
+                continue
+            if _is_duplicate(sentence, kept_texts, duplicate_threshold):
+                continue
+            kept_texts.append(sentence)
+            score = fuzz.token_set_ratio(question, sentence) + fuzz.partial_ratio(question.lower(), sentence.lower())
+            candidates.append(((doc_rank, position), score, sentence))
+
+    # Pehle best-scoring sentences, tie hone par jo chunk upar retrieve hua wo jeetega
+    selected = []
+    used_tokens = 0
+    for order, score, sentence in sorted(candidates, key=lambda c: (-c[1], c[0])):
+        tokens = count_tokens(sentence) + 1  # +1 newline ke liye
+        if used_tokens + tokens > token_budget:
+            continue
+        selected.append((order, sentence))
+        used_tokens += tokens
+
+    context = "\n".join(sentence for _, sentence in sorted(selected))
+    return context, count_tokens(context)
+
+
+_STOPWORDS = {"the", "and", "for", "what", "which", "who", "how", "are", "is", "of", "in", "at", "to", "about", "there", "does", "do", "gbu"}
+
+
+def _lexical_score(question_terms, sentence):
+    """Share of the question's content words found in the sentence, nudged by fuzzy partial match."""
+    if not question_terms:
+        # Sirf stopwords wala sawaal: lexical signal kuch nahi, ranking embedding score se hogi
+        return 0.0
+    sentence_lower = sentence.lower()
+    overlap = sum(1 for term in question_terms if term in sentence_lower) / len(question_terms)
+    return 0.8 * overlap + 0.2 * fuzz.partial_ratio(" ".join(question_terms), sentence_lower) / 100
+
+
+def _snippet_window(question_terms, sentence, max_words=SNIPPET_MAX_WORDS):
+    """Trim a long sentence to the max_words window with the most question-term hits."""
+    words = sentence.split()
+    if len(words) <= max_words:
+        return sentence
+    hits = [1 if any(term in word.lower() for term in question_terms) else 0 for word in words]
+    window = sum(hits[:max_words])
+    best_start, best_hits = 0, window
+    for start in range(1, len(words) - max_words + 1):
+        window += hits[start + max_words - 1] - hits[start - 1]
+        if window > best_hits:
+            best_start, best_hits = start, window
+    # Pehla hit window ke bilkul kinare pe na rahe, thoda pehle ka context bhi dikhe
+    if best_hits:
+        first_hit = best_start + hits[best_start:best_start + max_words].index(1)
+        best_start = max(0, min(best_start, first_hit - max_words // 4))
+    end = best_start + max_words
+    return ("... " if best_start > 0 else "") + " ".join(words[best_start:end]) + (" ..." if end < len(words) else "")
+
+
+def extract_snippets(question, documents, distances=None, sentences_per_passage=2):
+    """
+    Extractive fallback: the sentences of each retrieved passage that best match the question.
+
+    Sentences are ranked by the passage's embedding similarity (1 - distance) plus a
+    lexical match against the question, and long ones are cut to a SNIPPET_MAX_WORDS
+    window around the best match. Returns [(passage_rank, [sentences])] best passage first.
+    """
+    distances = distances or [0.5] * len(documents)
+    question_terms = [t for t in re.findall(r"[a-z0-9.+]+", question.lower()) if len(t) > 2 and t not in _STOPWORDS]
+    scored_passages = []
+    for rank, (doc, distance) in enumerate(zip(documents, distances)):
+        embedding_score = 1 - distance
+        ranked = []
+        for position, sentence in enumerate(split_sentences(doc)):
+            lexical_score = _lexical_score(question_terms, sentence)
+            ranked.append((0.5 * embedding_score + 0.5 * lexical_score, position, sentence))
+        if not ranked:
+            continue
+        best = sorted(ranked, reverse=True)[:sentences_per_passage]
+        # Passage ke andar original order mein dikhao, padhne mein aasaan
+        sentences = [_snippet_window(question_terms, sentence) for _, _, sentence in sorted(best, key=lambda item: item[1])]
+        scored_passages.append((max(score for score, _, _ in best), rank, sentences))
+    return [(rank, sentences) for _, rank, sentences in sorted(scored_passages, key=lambda item: (-item[0], item[1]))]
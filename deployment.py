@@ -0,0 +1,93 @@
+import os
+import threading
+
+EMBEDDINGS_PATH = "./embeddings"
+INGEST_LOCK_FILE = os.path.join(EMBEDDINGS_PATH, "ingest.lock")
+INDEX_GENERATION_FILE = os.path.join(EMBEDDINGS_PATH, "index_generation")
+# Kai worker processes mein chal rahe ho toh "1" karo: compact store mmap se khulega taaki pages share hon
+MULTI_WORKER = os.getenv("MULTI_WORKER", "0") == "1"
+
+_lock_file = None
+
+
+def acquire_ingest_lock(path=INGEST_LOCK_FILE):
+    """
+    Try to become the single ingest leader. Non-blocking; the lock is held for the
+    life of the process, so exactly one worker rebuilds the index.
+    """
+    global _lock_file
+    if _lock_file is not None:
+        return True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _lock_file = lock_file
+    return True
+
+
+def read_index_generation(path=INDEX_GENERATION_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return int(file.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_index_generation(path=INDEX_GENERATION_FILE):
+    """Called by the leader after a successful ingest; workers reload when they see the new number."""
+    generation = read_index_generation(path) + 1
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(str(generation))
+    os.replace(tmp_path, path)
+    index_watcher.seen_generation = generation
+    return generation
+
+
+class IndexWatcher:
+    """Runs reload callbacks when the on-disk index generation changes (checked with a cheap stat)."""
+
+    def __init__(self, path=INDEX_GENERATION_FILE):
+        self.path = path
+        self.seen_generation = None
+        self._mtime = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def on_change(self, callback):
+        self._callbacks.append(callback)
+
+    def check(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            generation = read_index_generation(self.path)
+            if generation == self.seen_generation:
+                return False
+            self.seen_generation = generation
+        print(f"🔄 Index generation {generation} detected, reloading")
+        for callback in self._callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Index reload step failed: {str(e)}")
+        return True
+
+
+index_watcher = IndexWatcher()
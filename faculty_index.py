@@ -0,0 +1,199 @@
+import os
+import re
+from collections import defaultdict
+
+from rapidfuzz import fuzz, process
+
+FACULTY_FILE = os.path.join("./data", "faculty.txt")
+
+# faculty.txt mein ek hi field ke do-do naam hain (Email ID / Email, Mobile / Phone ...)
+_FIELD_ALIASES = {
+    "email id": "email",
+    "email": "email",
+    "mobile": "mobile",
+    "phone": "mobile",
+    "education": "education",
+    "qualifications": "education",
+    "specialization": "specialization",
+}
+_FIELD_LINE = re.compile(r"^(Email ID|Email|Mobile|Phone|Education|Qualifications|Specialization)\s*:\s*(.*)$", re.IGNORECASE)
+# Itne se chhote naam-query pe fuzzy match nahi karenge ("us", "hi" kisi bhi naam ke andar mil jaate hain)
+MIN_NAME_QUERY_LENGTH = 3
+_TITLES = re.compile(r"^(dr|prof|mr|ms|mrs)\.?\s+", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9+#]+")
+
+# Query ke kaunse shabd kis field ki taraf ishara karte hain
+_FIELD_KEYWORDS = {
+    "email": ("email", "mail", "e-mail"),
+    "mobile": ("mobile", "phone", "number", "contact", "call"),
+    "education": ("education", "qualification", "degree", "phd", "studied"),
+    "specialization": ("specialization", "specialisation", "expertise", "research area"),
+}
+_SPECIALIZATION_INTENT = ("specializ", "specialis", "expert", "works on", "working on", "research in", "who teaches")
+_STOPWORDS = {
+    "a", "an", "the", "of", "for", "in", "on", "is", "are", "what", "whats", "who", "which", "me", "give", "tell",
+    "please", "pls", "sir", "maam", "ma'am", "dr", "prof", "mr", "ms", "mrs", "id", "and", "to", "about", "his",
+    "her", "their", "faculty", "professor", "professors", "teacher", "teachers", "gbu", "at", "from", "with",
+    "does", "do", "can", "i", "get", "find", "details", "info", "information", "contact", "number", "email",
+    "mail", "mobile", "phone", "education", "qualification", "qualifications", "specialization", "specialisation",
+    "expert", "experts", "expertise", "works", "working", "research", "teaches", "area", "areas", "degree",
+    "call", "e-mail", "studied", "specializes", "specialises", "specialized", "specialised", "field",
+}
+
+
+def normalize_name(name):
+    name = _TITLES.sub("", name.strip())
+    return " ".join(_WORD.findall(name.lower()))
+
+
+def _clean_value(value):
+    """Placeholder values like 'Coming Soon' or '“Unavailable”' are treated as missing."""
+    value = value.strip().strip("-").strip().strip("“”\"").strip()
+    if not value or value.lower() in {"coming soon", "not mentioned", "unavailable", "uavailable", "na", "n/a"}:
+        return None
+    return value
+
+
+def parse_faculty_text(text):
+    """Parse faculty.txt into a list of record dicts grouped under their school/department header."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    records = []
+    school = None
+    current = None
+    for i, line in enumerate(lines):
+        field = _FIELD_LINE.match(line)
+        if field:
+            if current is not None:
+                current[_FIELD_ALIASES[field.group(1).lower()]] = _clean_value(field.group(2))
+            continue
+
+        # Naam ke turant baad Email wali line aati hai, warna ye school/department ka header hai
+        next_line = lines[i + 1] if i + 1 < len(lines) else ""
+        if next_line.lower().startswith("email"):
+            current = {
+                "name": line,
+                "school": school,
+                "email": None,
+                "mobile": None,
+                "education": None,
+                "specialization": None,
+            }
+            records.append(current)
+        else:
+            school = line
+            current = None
+    return records
+
+
+class FacultyIndex:
+    """In-memory faculty directory with exact/fuzzy name lookup and a specialization inverted index."""
+
+    def __init__(self, records):
+        self.records = records
+        self.by_name = defaultdict(list)
+        self.specialization_index = defaultdict(set)
+        for record_id, record in enumerate(records):
+            # Ek hi naam ke do log ho sakte hain (do Dr. Rakesh Kumar hain), isliye list
+            self.by_name[normalize_name(record["name"])].append(record_id)
+            for term in _WORD.findall((record["specialization"] or "").lower()):
+                if term not in _STOPWORDS:
+                    self.specialization_index[term].add(record_id)
+        self.names = list(self.by_name)
+
+    def lookup_name(self, query, score_cutoff=85, limit=5):
+        key = normalize_name(query)
+        if len(key) < MIN_NAME_QUERY_LENGTH:
+            return []
+        if key in self.by_name:
+            return [self.records[record_id] for record_id in self.by_name[key]]
+
+        matches = process.extract(key, self.names, scorer=fuzz.WRatio, score_cutoff=score_cutoff, limit=limit)
+        # WRatio "us" ko "vidushi" ke andar bhi match kar deta hai; kam se kam ek poora naam ka shabd milna chahiye
+        query_tokens = [t for t in key.split() if len(t) >= MIN_NAME_QUERY_LENGTH]
+        matches = [
+            match for match in matches
+            if any(fuzz.ratio(q, t) >= score_cutoff for q in query_tokens for t in match[0].split())
+        ]
+        if not matches:
+            return []
+        # Sirf top score wale rakho, "kumar" jaise common naam pe saare barabar wale dikha denge
+        best = matches[0][1]
+        return [
+            self.records[record_id]
+            for name, score, _ in matches
+            if score >= best - 2
+            for record_id in self.by_name[name]
+        ]
+
+    def lookup_specialization(self, query):
+        terms = [t for t in _WORD.findall(query.lower()) if t not in _STOPWORDS]
+        if not terms:
+            return []
+        postings = [self.specialization_index.get(term, set()) for term in terms]
+        record_ids = set.intersection(*postings)
+        return [self.records[record_id] for record_id in sorted(record_ids)]
+
+
+_faculty_index = None
+
+
+def build_faculty_index(path=FACULTY_FILE):
+    global _faculty_index
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            _faculty_index = FacultyIndex(parse_faculty_text(file.read()))
+        print(f"📇 Faculty index ready: {len(_faculty_index.records)} records")
+    except Exception as e:
+        print(f"⚠️ Faculty index build failed: {str(e)}")
+        _faculty_index = FacultyIndex([])
+    return _faculty_index
+
+
+def get_faculty_index():
+    if _faculty_index is None:
+        return build_faculty_index()
+    return _faculty_index
+
+
+def _requested_fields(prompt):
+    lowered = prompt.lower()
+    return [field for field, words in _FIELD_KEYWORDS.items() if any(word in lowered for word in words)]
+
+
+def _format_record(record, fields):
+    parts = []
+    for field in fields or ["email", "mobile", "education", "specialization"]:
+        label = field.capitalize()
+        parts.append(f"{label}: {record[field] or 'not available in the faculty directory'}")
+    header = record["name"] + (f" ({record['school']})" if record["school"] else "")
+    return header + "\n" + "\n".join(parts)
+
+
+def answer_directory_query(prompt):
+    """
+    Answer faculty directory questions straight from the index.
+
+    Returns the answer text, or None when the prompt is not a directory lookup and
+    should go through the normal RAG pipeline.
+    """
+    index = get_faculty_index()
+    if not index.records:
+        return None
+
+    lowered = prompt.lower()
+    fields = _requested_fields(prompt)
+
+    if any(phrase in lowered for phrase in _SPECIALIZATION_INTENT):
+        matches = index.lookup_specialization(prompt)
+        if matches:
+            lines = [f"- {r['name']}" + (f" ({r['email']})" if r["email"] else "") for r in matches]
+            return "Faculty working in this area:\n" + "\n".join(lines)
+
+    # Naam dhoondhne ke liye sirf wo shabd bachao jo field/intent words nahi hain
+    name_query = " ".join(t for t in _WORD.findall(lowered) if t not in _STOPWORDS)
+    if not fields and not lowered.startswith("who is"):
+        return None
+    matches = index.lookup_name(name_query)
+    if not matches:
+        return None
+    return "\n\n".join(_format_record(record, fields) for record in matches)
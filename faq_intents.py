@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+CONTEXT_FILE = os.path.join("./data", "context.txt")
+FAQ_CACHE_FILE = os.path.join("./embeddings", "faq_cache.json")
+# Itna cosine similarity ho tabhi FAQ ka ready-made answer denge, warna poori pipeline chalegi
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.88"))
+
+_SECTION_HEADER = re.compile(r"^\d+\.\s+(.+?)\s*$", re.MULTILINE)
+
+# Curated sawaal kabhi sirf ek shabd se alag hote hain (B.Tech vs M.Tech fee), embedding akele ye farak nahi pakadta.
+# Canned answer tabhi denge jab query aur canonical question mein ye terms bilkul same hon.
+_PROGRAM = re.compile(r"\b([bm])\s?(tech|sc|com|arch|des|pharm|ed)\b")
+_ENTITY_TERMS = {
+    "mba", "bba", "bca", "mca", "phd", "llb", "llm", "ug", "pg",
+    "hostel", "mess", "library", "transport", "vicechancellor", "chancellor", "registrar",
+    "naac", "nirf", "highest", "average", "lowest",
+}
+
+# Sabse zyada pooche jane wale sawaal, section title ke hisaab se
+CURATED_QUESTIONS = {
+    "General Overview": [
+        "What is the NAAC grade of GBU?",
+        "What is the NIRF ranking of GBU?",
+        "When was Gautam Buddha University established?",
+        "Who is the vice chancellor of GBU?",
+    ],
+    "Detailed Hostel Information": [
+        "What are the hostel facilities at GBU?",
+        "How many hostels are there in GBU?",
+        "What are the hostel rules?",
+    ],
+    "Enhanced Placement and Career Support": [
+        "What are the placement statistics of GBU?",
+        "Which companies come for placements?",
+        "What is the average package at GBU?",
+        "What is the highest package at GBU?",
+    ],
+    "Admission Process and Eligibility": [
+        "How do I get admission in GBU?",
+        "What is the eligibility for B.Tech admission?",
+        "Which entrance exam is required for GBU?",
+        "How do I get admission in MBA at GBU?",
+    ],
+    "Financial Information and Scholarships": [
+        "What is the fee structure at GBU?",
+        "What is the B.Tech fee at GBU?",
+        "What is the hostel fee at GBU?",
+        "What scholarships are available at GBU?",
+    ],
+}
+
+# Build ke baad yahan matrix aur answers rehte hain; poora tuple ek saath replace hota hai
+_faq_state = None
+
+
+def split_sections(text):
+    """Split context.txt on its numbered headers into {title: section_text}."""
+    headers = list(_SECTION_HEADER.finditer(text))
+    sections = {}
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        sections[header.group(1)] = text[header.start():end].strip()
+    return sections
+
+
+def section_hash(section_text):
+    return hashlib.sha256(section_text.encode("utf-8")).hexdigest()
+
+
+def canonical_questions(title):
+    # Har section ke liye ek auto-generated sawaal, upar se curated wale
+    return [f"Tell me about {title.lower()} at GBU"] + CURATED_QUESTIONS.get(title, [])
+
+
+def entity_terms(text):
+    """Program and entity terms of a question ("btech", "hostel", "vicechancellor", ...)."""
+    text = re.sub(r"vice[\s-]?chancellor", "vicechancellor", text.lower())
+    text = re.sub(r"[.\-]", "", text)
+    terms = {"".join(match.groups()) for match in _PROGRAM.finditer(text)}
+    return terms | {word for word in re.findall(r"[a-z]+", text) if word in _ENTITY_TERMS}
+
+
+def _load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, cache):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(cache, file)
+    os.replace(tmp_path, path)
+
+
+def build_faq_index(embed_fn, answer_fn, context_path=CONTEXT_FILE, cache_path=FAQ_CACHE_FILE,
+                    embedding_model=None, generation_model=None):
+    """
+    Embed the canonical questions and pre-generate their answers.
+
+    Answers are cached keyed by the hash of their source section and the generation
+    model, embeddings by the embedding model, so only questions whose section or
+    model changed since the last ingest are embedded or go through the LLM again.
+    """
+    global _faq_state
+    try:
+        with open(context_path, "r", encoding="utf-8") as file:
+            sections = split_sections(file.read())
+    except OSError as e:
+        print(f"⚠️ FAQ index skip: {str(e)}")
+        return False
+
+    cache = _load_cache(cache_path)
+    new_cache = {}
+    regenerated = 0
+    for title, section_text in sections.items():
+        digest = section_hash(section_text)
+        for question in canonical_questions(title):
+            entry = cache.get(question) or {}
+            # EMBEDDING_MODEL badla toh purane vectors ka dimension hi alag ho sakta hai
+            embedding = entry.get("embedding") if entry.get("embedding_model") == embedding_model else None
+            answer = entry.get("answer") if entry.get("section_hash") == digest and entry.get("generation_model") == generation_model else None
+            if not embedding or not answer:
+                try:
+                    embedding = embedding or embed_fn(question)
+                    answer = answer or answer_fn(question, section_text)
+                except Exception as e:
+                    print(f"❌ FAQ entry failed: {question}: {str(e)}")
+                    continue
+                if embedding is None or not answer:
+                    print(f"❌ FAQ entry failed: {question}")
+                    continue
+                regenerated += 1
+            new_cache[question] = {
+                "section": title,
+                "section_hash": digest,
+                "answer": answer,
+                "embedding": embedding,
+                "embedding_model": embedding_model,
+                "generation_model": generation_model,
+            }
+
+    if not new_cache:
+        return False
+
+    _save_cache(cache_path, new_cache)
+    _faq_state = _state_from_cache(new_cache)
+    print(f"💡 FAQ index ready: {len(new_cache)} questions ({regenerated} regenerated)")
+    return True
+
+
+def _state_from_cache(cache):
+    questions = list(cache)
+    matrix = np.array([cache[q]["embedding"] for q in questions], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return questions, matrix, [cache[q]["answer"] for q in questions]
+
+
+def load_faq_index(cache_path=FAQ_CACHE_FILE, embedding_model=None):
+    """Load the FAQ index from the cache written by the ingest leader, without generating anything."""
+    global _faq_state
+    cache = {q: entry for q, entry in _load_cache(cache_path).items() if entry.get("embedding_model") == embedding_model}
+    if not cache:
+        _faq_state = None
+        return False
+    _faq_state = _state_from_cache(cache)
+    print(f"💡 FAQ index loaded: {len(cache)} questions")
+    return True
+
+
+def match_faq(query_embedding, query_text=None, threshold=FAQ_MATCH_THRESHOLD):
+    """
+    Return (question, answer, score) for the closest canonical question above threshold,
+    or None. With query_text, a question only matches when its program/entity terms are the same.
+    """
+    state = _faq_state
+    if state is None or query_embedding is None:
+        return None
+
+    questions, matrix, answers = state
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    if norm == 0 or query.shape[-1] != matrix.shape[1]:
+        return None
+    scores = matrix @ (query / norm)
+    query_terms = entity_terms(query_text) if query_text is not None else None
+    for best in np.argsort(-scores):
+        if scores[best] < threshold:
+            break
+        if query_terms is not None and entity_terms(questions[best]) != query_terms:
+            continue
+        return questions[best], answers[best], float(scores[best])
+    return None
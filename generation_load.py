@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Isse zyada wait lagne wala ho toh LLM answer ke bajaye snippets de do
+GENERATION_WAIT_BUDGET = float(os.getenv("GENERATION_WAIT_BUDGET", "20"))
+# Ollama ek saath kitni generations chalata hai (OLLAMA_NUM_PARALLEL jaisa)
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "1"))
+# Shuruaati andaza jab tak asli timings nahi aati
+INITIAL_GENERATION_SECONDS = float(os.getenv("INITIAL_GENERATION_SECONDS", "15"))
+# Koi generation na chale toh purana slow average itne seconds mein aadha hokar shuruaati andaze ki taraf laut aata hai
+AVERAGE_DECAY_HALF_LIFE = float(os.getenv("GENERATION_AVERAGE_HALF_LIFE", "300"))
+
+
+class GenerationLoad:
+    """
+    Tracks in-flight Mistral generations and a moving average of their duration
+    to estimate how long a new request would queue before its generation starts.
+    While nothing is running the average decays back towards initial_seconds, so a
+    few slow generations don't keep the estimate high forever. Counts only this
+    process's generations, not other workers sharing the same Ollama.
+    """
+
+    def __init__(self, concurrency=GENERATION_CONCURRENCY, initial_seconds=INITIAL_GENERATION_SECONDS, alpha=0.2,
+                 half_life=AVERAGE_DECAY_HALF_LIFE):
+        self.concurrency = max(1, concurrency)
+        self.initial_seconds = initial_seconds
+        self.avg_seconds = initial_seconds
+        self.alpha = alpha
+        self.half_life = half_life
+        self.in_flight = 0
+        self._last_finished = time.time()
+        self._lock = threading.Lock()
+
+    def _average(self, now):
+        # Lock pakad ke hi call karo
+        if self.in_flight or self.half_life <= 0:
+            return self.avg_seconds
+        decay = 0.5 ** ((now - self._last_finished) / self.half_life)
+        return self.initial_seconds + (self.avg_seconds - self.initial_seconds) * decay
+
+    @contextmanager
+    def track(self):
+        started = time.time()
+        with self._lock:
+            # Idle time ka decay average mein pakka kar do, chalte waqt decay nahi hota
+            self.avg_seconds = self._average(started)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            now = time.time()
+            with self._lock:
+                self.avg_seconds = (1 - self.alpha) * self.avg_seconds + self.alpha * (now - started)
+                self.in_flight -= 1
+                self._last_finished = now
+
+    def estimated_wait(self):
+        """Seconds a newly queued generation would wait for the work already ahead of it."""
+        with self._lock:
+            return self.in_flight / self.concurrency * self._average(time.time())
+
+    def is_saturated(self, budget=GENERATION_WAIT_BUDGET):
+        # Free slot ho toh request turant chalegi, chahe average kitna bhi slow ho
+        with self._lock:
+            if self.in_flight < self.concurrency:
+                return False
+        return self.estimated_wait() > budget
+
+    def status(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "avg_seconds": round(self._average(time.time()), 3)}
+
+
+generation_load = GenerationLoad()
@@ -4,12 +4,23 @@ import fitz
 import ollama
 import chromadb
 from tqdm import tqdm
-import whisper
 import tempfile
+import time
+import requests
 from werkzeug.utils import secure_filename
 
 from rapidfuzz import process
 
+from context_packer import pack_context, count_tokens, extract_snippets, CONTEXT_TOKEN_BUDGET, GENERATION_NUM_CTX, ANSWER_TOKEN_RESERVE
+from faculty_index import build_faculty_index, answer_directory_query
+from faq_intents import build_faq_index, load_faq_index, match_faq
+from sessions import session_store, is_anaphoric_follow_up, FOLLOW_UP_MIN_CONFIDENCE
+from vector_store import build_compact_store, get_compact_store, reset_compact_store
+from model_residency import residency_manager, GENERATION_MODEL, EMBEDDING_MODEL, KEEP_ALIVE, WHISPER_SERVICE_URL
+from generation_load import generation_load
+from deployment import acquire_ingest_lock, bump_index_generation, index_watcher
+from relevance_gate import build_relevance_gate, load_relevance_gate, gate_query
+
 # Important GBU-specific terms you care about
 important_keywords = [
     "Gautam Buddha University",
@@ -40,14 +51,19 @@ important_keywords = [
 ]
 
 # Whisper karne ke liye whisper model load kar rahe hain, eaves drop nahi karega pakka promise
-whisper_model = whisper.load_model("small")  # or "base", "medium", "large"
+# (ab pehli voice request pe load hota hai, residency_manager idle hone pe hata bhi sakta hai)
 
 def transcribe_audio(file):
     try:
         filename = secure_filename(file.filename)
+        # Multi-worker setup mein Whisper ek hi process mein rehta hai, baaki workers audio wahan bhej dete hain
+        if WHISPER_SERVICE_URL:
+            response = requests.post(WHISPER_SERVICE_URL, files={"audio": (filename, file.stream, file.mimetype)}, timeout=300)
+            response.raise_for_status()
+            return response.json()["transcription"]
         with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_audio:
             file.save(temp_audio.name)
-            result = whisper_model.transcribe(temp_audio.name)
+            result = residency_manager.get_whisper_model().transcribe(temp_audio.name)
             return result["text"]
     except Exception as e:
         return f"Error during transcription: {str(e)}"
@@ -75,36 +91,49 @@ def chunk_text(text, max_length=500):    # text ko tod rahe hain jaise main...ne
 def get_embedding(text):
     """Get embeddings using Ollama's embeddings endpoint with nomic-embed-text model"""
     try:
-        # First, make sure we have the model
-        ollama.pull('nomic-embed-text')
-        
-        # Get embeddings
+        # Model pull/warm-up residency_manager startup pe ek baar kar deta hai
         response = ollama.embeddings(
-            model='nomic-embed-text',
-            prompt=text
+            model=EMBEDDING_MODEL,
+            prompt=text,
+            keep_alive=KEEP_ALIVE
         )
         return response.get('embedding', None)
     except Exception as e:
         print(f"Error getting embedding: {str(e)}")
         return None
 
+def get_embeddings(texts):
+    """Embed many texts in one go; entries that fail come back as None"""
+    if not texts:
+        return []
+    # Naye ollama client mein batch embed hai, ek hi call mein saare sawaal
+    if hasattr(ollama, "embed"):
+        try:
+            response = ollama.embed(model=EMBEDDING_MODEL, input=list(texts), keep_alive=KEEP_ALIVE)
+            return list(response.get('embeddings', [None] * len(texts)))
+        except Exception as e:
+            print(f"Error getting batch embeddings: {str(e)}")
+    # Purane client (0.1.x) mein sirf single prompt chalta hai
+    return [get_embedding(text) for text in texts]
+
 def embed_documents(chunks):
     try:
         client = chromadb.PersistentClient(path="./embeddings")
 
-        # Delete existing collection if it exists
+        # Naya index staging collection mein banao, taaki ingest ke dauraan queries purana index padhti rahen
         try:
-            client.delete_collection("gbu_docs")
+            client.delete_collection("gbu_docs_staging")
         except:
             pass
 
         # Create new collection with metadata
         collection = client.create_collection(
-            name="gbu_docs",
+            name="gbu_docs_staging",
             metadata={"hnsw:space": "cosine"}  # Specify distance metric
         )
 
         successful_embeds = 0
+        embedded_vectors, embedded_chunks = [], []
         for i, chunk in enumerate(tqdm(chunks, desc="Embedding Chunks")):
             try:
                 embeddings = get_embedding(chunk)
@@ -119,10 +148,27 @@ def embed_documents(chunks):
                     metadatas=[{"source": "gbu_docs", "chunk_id": str(i)}]
                 )
                 successful_embeds += 1
+                embedded_vectors.append(embeddings)
+                embedded_chunks.append(chunk)
             except Exception as e:
                 print(f"❌ Chunk {i} failed: {str(e)}")
         
         print(f"\n✅ Waah! {successful_embeds} chunks embed ho gaye, total {len(chunks)} mein se")
+
+        if successful_embeds > 0:
+            # Delete existing collection if it exists, phir staging ko uski jagah rakh do
+            try:
+                client.delete_collection("gbu_docs")
+            except:
+                pass
+            collection.modify(name="gbu_docs")
+
+        # Chroma ke saath float16/int8 wala compact store bhi, VECTOR_STORE_MODE se choose hota hai
+        if embedded_vectors:
+            build_compact_store(embedded_vectors, embedded_chunks)
+            reset_compact_store()
+            # Off-topic sawaalon ko vector search se pehle hi rokne ke liye corpus centroids
+            build_relevance_gate(embedded_vectors, get_embeddings)
         return successful_embeds > 0
     except Exception as e:
         print(f"❌ Error in embed_documents: {str(e)}")
@@ -150,11 +196,35 @@ def correct_prompt(user_prompt, threshold=85):
     return corrected
 
 
+# Chroma mode mein collection swap ke beech query fail ho toh itni der baad ek retry
+COLLECTION_SWAP_RETRY_SECONDS = float(os.getenv("COLLECTION_SWAP_RETRY_SECONDS", "0.5"))
+
+
+def query_index(query_embeddings, n_results=3):
+    """Top chunks for each query embedding from the compact store or the Chroma collection, Chroma-shaped."""
+    compact_store = get_compact_store()
+    if compact_store is not None:
+        return compact_store.query(query_embeddings, n_results=n_results)
+
+    client = chromadb.PersistentClient(path="./embeddings")
+    for attempt in range(2):
+        try:
+            collection = client.get_collection("gbu_docs")
+            return collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                include=["documents", "distances"]
+            )
+        except Exception:
+            if attempt:
+                raise
+            # Leader ke delete_collection("gbu_docs") aur staging.modify() ke beech thodi der gbu_docs hota hi nahi,
+            # ek baar ruk ke dobara try karo
+            time.sleep(COLLECTION_SWAP_RETRY_SECONDS)
+
+
 def is_relevant_query(prompt, threshold=0.35): 
     try:
-        client = chromadb.PersistentClient(path="./embeddings")
-        collection = client.get_collection("gbu_docs")
-
         corrected_prompt = correct_prompt(prompt)
         print(f"✅ Corrected Prompt (for relevance): {corrected_prompt}")
 
@@ -162,53 +232,50 @@ def is_relevant_query(prompt, threshold=0.35):
         if query_embedding is None:
             return False
 
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=3,
-            include=["documents", "distances"]
-        )
+        results = query_index([query_embedding], n_results=3)
 
         documents = results.get("documents", [[]])[0]
         distances = results.get("distances", [[1]])[0]
 
-        if not documents:
-            return False
-
-        # Check fuzzy similarity against top doc
-        top_doc = documents[0]
-        similarity = fuzz.token_set_ratio(corrected_prompt, top_doc)
-
-        print(f"🔍 Embedding similarity: {1 - distances[0]}, Fuzzy similarity: {similarity}")
-
-        return (1 - distances[0]) > threshold or similarity > 65
+        return passes_relevance(corrected_prompt, documents, distances, threshold)
     except Exception as e:
         print(f"⚠️ Error in is_relevant_query: {str(e)}")
         return False
 
 
-def answer_query(prompt):
-    try:
-        client = chromadb.PersistentClient(path="./embeddings")
-        collection = client.get_collection("gbu_docs")
-        
-        if not is_relevant_query(prompt):  # use original prompt
-            return "I don't know about that, ask me about GBU"
+def passes_relevance(corrected_prompt, documents, distances, threshold=0.35):
+    """Relevance decision from already retrieved documents/distances for a (corrected) prompt."""
+    if not documents:
+        return False
 
-        query_embedding = get_embedding(prompt)  # again, original prompt
-        if query_embedding is None:
-            return "Sorry, I couldn't process your question at the moment"
+    # Check fuzzy similarity against top doc
+    top_doc = documents[0]
+    similarity = fuzz.token_set_ratio(corrected_prompt, top_doc)
 
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=3
-        )
-        
-        documents = results.get("documents", [[]])[0]
-        if not documents:
-            return "No matching docs found for your query"
+    print(f"🔍 Embedding similarity: {1 - distances[0]}, Fuzzy similarity: {similarity}")
+
+    return (1 - distances[0]) > threshold or similarity > 65
 
-        context = "\n".join(doc for doc in documents)
 
+def generate_answer(prompt, context, session=None):
+    """
+    Build the assistant prompt around context and run it through Mistral. Returns None on failure.
+
+    With a session that already holds Ollama's `context` token state, only the new
+    question and any newly retrieved text are sent, so the shared prefix isn't prefilled again.
+    """
+    llm_context = session["context"] if session else None
+    if llm_context:
+        final_prompt = f"""Question:
+{prompt}
+
+Answer:"""
+        if context:
+            final_prompt = f"""Additional context:
+{context}
+
+""" + final_prompt
+    else:
         final_prompt = f"""You are a helpful university assistant for Gautam Buddha University. Use the context below to answer the question clearly and concisely.
 
 Context:
@@ -219,11 +286,118 @@ Question:
 
 Answer:"""
 
-        response = ollama.generate(model="mistral", prompt=final_prompt)
-        if not response or "response" not in response:
+    print(f"🧮 Prompt tokens: {count_tokens(final_prompt)}" + (" (follow-up)" if llm_context else ""))
+
+    # num_ctx/num_predict pakke rakho, warna session ke budget ka hisaab Ollama ke default se mel nahi khayega
+    options = {"num_ctx": GENERATION_NUM_CTX, "num_predict": ANSWER_TOKEN_RESERVE}
+    with generation_load.track():
+        if llm_context:
+            response = ollama.generate(model=GENERATION_MODEL, prompt=final_prompt, context=llm_context, options=options, keep_alive=KEEP_ALIVE)
+        else:
+            response = ollama.generate(model=GENERATION_MODEL, prompt=final_prompt, options=options, keep_alive=KEEP_ALIVE)
+    if not response or "response" not in response:
+        return None
+
+    if session is not None:
+        session_store.record_turn(session, response.get("context"))
+    return response["response"]
+
+
+def snippet_answer(prompt, documents, distances=None):
+    """Retrieval-only answer: the most relevant sentences of the top passages, marked as snippets."""
+    snippets = extract_snippets(prompt, documents, distances)
+    lines = ["[Snippets] The assistant is busy right now, so here are the most relevant excerpts from GBU documents:"]
+    for number, (_, sentences) in enumerate(snippets, start=1):
+        lines.append(f"{number}. " + " ... ".join(sentences))
+    return "\n".join(lines)
+
+
+def is_on_topic(prompt, query_embedding):
+    """
+    Centroid gate (a few dot products) when calibrated, otherwise the full is_relevant_query check.
+    Returns (relevant, confidence); confidence is None without the gate.
+    """
+    gate = gate_query(query_embedding)
+    if gate is None:
+        return is_relevant_query(prompt), None  # use original prompt
+    relevant, confidence = gate
+    print(f"🎯 Centroid gate: relevant={relevant}, confidence={confidence:.3f}")
+    return relevant, confidence
+
+
+def allow_follow_up(prompt, confidence):
+    """A gate-rejected question still goes through in a session only if it is borderline or leans on the last turn."""
+    return (confidence is not None and confidence >= FOLLOW_UP_MIN_CONFIDENCE) or is_anaphoric_follow_up(prompt)
+
+
+def answer_query(prompt, session_id=None):
+    try:
+        # Leader ne naya index banaya ho toh pehle use utha lo (sirf ek stat call)
+        index_watcher.check()
+
+        # Faculty directory wale sawaal (email/mobile/specialization) seedha index se, LLM ki zaroorat nahi
+        directory_answer = answer_directory_query(prompt)
+        if directory_answer:
+            return directory_answer
+
+        query_embedding = get_embedding(prompt)  # original prompt, FAQ aur retrieval dono isi se
+        if query_embedding is None:
+            return "Sorry, I couldn't process your question at the moment"
+
+        # Fees/hostel/placement jaise common sawaal ka pehle se bana answer
+        faq_match = match_faq(query_embedding, prompt)
+        if faq_match:
+            faq_question, faq_answer, faq_score = faq_match
+            print(f"💡 FAQ hit: {faq_question} ({faq_score:.3f})")
+            return faq_answer
+
+        session = session_store.get_or_create(session_id)[1] if session_id else None
+        # Bhejne se pehle dekho ki stored context + naya context + answer num_ctx mein aayega; nahi toh session taaza
+        follow_up_budget = session_store.follow_up_budget(session, prompt) if session is not None else None
+        is_follow_up = follow_up_budget is not None
+
+        # "aur uski hostel fee?" jaisa follow-up akela off-topic lag sakta hai, session mein sirf aise
+        # borderline sawaal jaane do; saaf off-topic sawaal session ke andar bhi reject
+        relevant, confidence = is_on_topic(prompt, query_embedding)
+        if not relevant:
+            if not (is_follow_up and allow_follow_up(prompt, confidence)):
+                return "I don't know about that, ask me about GBU"
+            documents = []
+        else:
+            results = query_index([query_embedding], n_results=3)
+            documents = results.get("documents", [[]])[0]
+            distances = results.get("distances", [[]])[0]
+            if not documents and not is_follow_up:
+                return "No matching docs found for your query"
+
+            # Mistral ki queue bhari hai toh wait karwane se accha turant snippets de do
+            if documents and generation_load.is_saturated():
+                print(f"🚦 Generation saturated (est. wait {generation_load.estimated_wait():.1f}s), returning snippets")
+                return snippet_answer(prompt, documents, distances)
+
+        # Teeno chunks seedha chipkane ke bajaye token budget ke andar best sentences pack karo,
+        # aur jo sentences is session mein model pehle hi dekh chuka hai unhe dobara mat bhejo.
+        # Follow-up ko sirf chhota budget milta hai, tabhi session se prefill bachta hai
+        seen = session["seen_sentences"] if session is not None else None
+        token_budget = follow_up_budget if is_follow_up else CONTEXT_TOKEN_BUDGET
+        context, context_tokens = pack_context(prompt, documents, token_budget=token_budget, seen=seen)
+        print(f"📦 Packed context tokens: {context_tokens}")
+
+        try:
+            answer = generate_answer(prompt, context, session=session)
+        except Exception as e:
+            if not documents:
+                raise
+            # Ollama timeout/error pe bhi khaali haath mat lautao
+            print(f"⚠️ Generation failed, returning snippets: {str(e)}")
+            return snippet_answer(prompt, documents, distances)
+        if answer is None:
             return "Sorry, I couldn't generate a response at the moment"
-            
-        return response["response"]
+
+        # Session reset hua ho toh agla turn poora prompt bhejega, tab seen sentences bhi khaali rehne chahiye
+        if session is not None and session["context"] and context:
+            session["seen_sentences"].update(context.split("\n"))
+        return answer
 
     except Exception as e:
         error_msg = str(e)
@@ -232,14 +406,34 @@ Answer:"""
             return "Database error occurred. Please restart the server to rebuild the database."
         return f"Error ho gaya bhai: {error_msg} huihuihi"
 
-def main():
+# Workers ko naya index generation dikhe toh in-memory indexes dobara load karo
+index_watcher.on_change(reset_compact_store)
+index_watcher.on_change(lambda: load_faq_index(embedding_model=EMBEDDING_MODEL))
+index_watcher.on_change(build_faculty_index)
+index_watcher.on_change(load_relevance_gate)
+
+
+def ingest():
+    """
+    Read ./data, rebuild every index and bump the index generation. Returns True on success.
+    Only the holder of the ingest lock may do this; with another leader running it returns False.
+    """
+    # app.py ka leader chal raha ho toh `python main.py` ko gbu_docs delete/recreate nahi karne dena
+    if not acquire_ingest_lock():
+        print("❌ Another process holds embeddings/ingest.lock and owns ingest, not rebuilding the index")
+        return False
+
     data_folder = "./data"
     chunks = []
 
+    # Mistral aur nomic-embed-text ko pehle hi load kar do, taaki pehla /chat cold start na jhele
+    print("\nWarming up models...")
+    residency_manager.start()
+
     # Check if data folder exists
     if not os.path.exists(data_folder):
         print(f"❌ Data folder not found: {data_folder}")
-        return
+        return False
 
     print("\nReading and processing documents...")
     for filename in os.listdir(data_folder):
@@ -256,15 +450,33 @@ def main():
 
     if not chunks:
         print("No text found in documents. Please check your files.")
-        return
+        return False
+
+    build_faculty_index()
 
     print(f"\n📄 Total chunks to embed: {len(chunks)}")
     
     if not embed_documents(chunks):
         print("\n❌ Failed to embed documents. Please check the errors above.")
-        return
+        return False
 
-    print("\nDocument embedding complete. You can now query the system.\n")
+    print("\nPre-generating FAQ answers...")
+    build_faq_index(get_embedding, generate_answer, embedding_model=EMBEDDING_MODEL, generation_model=GENERATION_MODEL)
+
+    generation = bump_index_generation()
+    print(f"\nDocument embedding complete (index generation {generation}). You can now query the system.\n")
+    return True
+
+
+def main():
+    if acquire_ingest_lock():
+        if not ingest():
+            return
+    else:
+        # Leader ka banaya index hi padh ke sawaal lo
+        print("Ingest leader already running, using its index")
+        residency_manager.start()
+        index_watcher.check()
 
     while True:
         query = input("❓ Ask a question (or type 'exit'): ")
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import ollama
+
+from context_packer import GENERATION_NUM_CTX
+
+GENERATION_MODEL = os.getenv("GENERATION_MODEL", "mistral")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")  # or "base", "medium", "large"
+
+# Office time mein models RAM mein hi rahen, baaki time Ollama apne default se unload kar dega
+KEEP_ALIVE = os.getenv("MODEL_KEEP_ALIVE", "30m")
+KEEP_ALIVE_REFRESH_SECONDS = float(os.getenv("MODEL_KEEP_ALIVE_REFRESH", "600"))
+BUSINESS_HOURS = os.getenv("BUSINESS_HOURS", "8-20")  # local time, "start-end" in hours
+# Voice traffic itni der band rahe toh Whisper ko RAM se hata do (0 = kabhi mat hatao)
+WHISPER_IDLE_UNLOAD_SECONDS = float(os.getenv("WHISPER_IDLE_UNLOAD", "0"))
+# Set ho toh transcription is URL (Whisper host process ka /transcribe) pe jaata hai aur yahan Whisper load nahi hota
+WHISPER_SERVICE_URL = os.getenv("WHISPER_SERVICE_URL", "")
+
+
+def in_business_hours(now=None):
+    start, end = (int(part) for part in BUSINESS_HOURS.split("-"))
+    hour = (now or datetime.now()).hour
+    return start <= hour < end
+
+
+class ModelResidencyManager:
+    """
+    Keeps the Ollama generation and embedding models warm.
+
+    Models are preloaded at startup with a throwaway request, their keep-alive is
+    refreshed during business hours, and Whisper is loaded lazily and optionally
+    unloaded when voice traffic goes idle.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._whisper_lock = threading.Lock()
+        self._whisper_model = None
+        self._whisper_last_used = 0.0
+        self._thread = None
+        self.state = {
+            GENERATION_MODEL: {"loaded": False, "last_warm": None, "load_seconds": None, "error": None},
+            EMBEDDING_MODEL: {"loaded": False, "last_warm": None, "load_seconds": None, "error": None},
+            "whisper-" + WHISPER_MODEL: {"loaded": False, "last_used": None},
+        }
+
+    def _ensure_pulled(self, model):
+        # Pehle har embedding pe pull hota tha, ab startup pe ek baar
+        try:
+            ollama.show(model)
+        except Exception:
+            print(f"⬇️ Pulling {model}...")
+            ollama.pull(model)
+
+    def warm(self, model):
+        """Load model into Ollama with a throwaway request and set its keep-alive."""
+        started = time.time()
+        try:
+            if model == EMBEDDING_MODEL:
+                ollama.embeddings(model=model, prompt="warm up", keep_alive=KEEP_ALIVE)
+            else:
+                # Wahi num_ctx jo answers mein jaata hai, warna pehli asli request pe model dobara load hoga
+                ollama.generate(model=model, prompt="", options={"num_ctx": GENERATION_NUM_CTX}, keep_alive=KEEP_ALIVE)
+            with self._lock:
+                self.state[model].update(loaded=True, last_warm=time.time(), load_seconds=round(time.time() - started, 3), error=None)
+            return True
+        except Exception as e:
+            print(f"⚠️ Warm-up failed for {model}: {str(e)}")
+            with self._lock:
+                self.state[model].update(loaded=False, error=str(e))
+            return False
+
+    def preload(self, whisper=True):
+        """Pull and warm the Ollama models; whisper=False skips Whisper (text-only callers like batch.py)."""
+        for model in (EMBEDDING_MODEL, GENERATION_MODEL):
+            try:
+                self._ensure_pulled(model)
+            except Exception as e:
+                print(f"⚠️ Pull failed for {model}: {str(e)}")
+            if self.warm(model):
+                print(f"🔥 {model} warm in {self.state[model]['load_seconds']}s")
+        # Idle unload band hai toh Whisper bhi pehle jaisa startup pe hi load kar lo
+        if whisper and WHISPER_IDLE_UNLOAD_SECONDS <= 0 and not WHISPER_SERVICE_URL:
+            try:
+                self.get_whisper_model()
+            except Exception as e:
+                print(f"⚠️ Whisper load failed: {str(e)}")
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(KEEP_ALIVE_REFRESH_SECONDS)
+            if in_business_hours():
+                for model in (EMBEDDING_MODEL, GENERATION_MODEL):
+                    self.warm(model)
+            self.unload_whisper_if_idle()
+
+    def start(self, whisper=True):
+        """Preload models (blocking, so ingest doesn't race the pull) and start the keep-alive refresher."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self.preload(whisper=whisper)
+        self._thread.start()
+
+    def get_whisper_model(self):
+        with self._whisper_lock:
+            if self._whisper_model is None:
+                # torch bhi saath aata hai, isliye import tabhi jab sach mein Whisper chahiye (WHISPER_SERVICE_URL wale workers mein kabhi nahi)
+                import whisper
+
+                print(f"🎙️ Loading Whisper {WHISPER_MODEL}...")
+                self._whisper_model = whisper.load_model(WHISPER_MODEL)
+            self._whisper_last_used = time.time()
+            with self._lock:
+                self.state["whisper-" + WHISPER_MODEL].update(loaded=True, last_used=self._whisper_last_used)
+            return self._whisper_model
+
+    def unload_whisper_if_idle(self):
+        if WHISPER_IDLE_UNLOAD_SECONDS <= 0:
+            return False
+        with self._whisper_lock:
+            if self._whisper_model is None or time.time() - self._whisper_last_used < WHISPER_IDLE_UNLOAD_SECONDS:
+                return False
+            # Mistral ke liye RAM khali karo, agla voice request phir se load karega
+            self._whisper_model = None
+            with self._lock:
+                self.state["whisper-" + WHISPER_MODEL]["loaded"] = False
+        print("💤 Whisper unloaded after voice idle")
+        return True
+
+    def status(self):
+        """Snapshot of load state; uses ollama.ps() when the client supports it."""
+        with self._lock:
+            snapshot = {name: dict(entry) for name, entry in self.state.items()}
+        if hasattr(ollama, "ps"):
+            try:
+                running = {m.get("name", "").split(":")[0] for m in ollama.ps().get("models", [])}
+                for model in (GENERATION_MODEL, EMBEDDING_MODEL):
+                    snapshot[model]["loaded"] = model in running
+            except Exception:
+                pass
+        snapshot["business_hours"] = in_business_hours()
+        return snapshot
+
+
+residency_manager = ModelResidencyManager()
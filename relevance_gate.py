@@ -0,0 +1,181 @@
+import os
+
+import numpy as np
+
+CENTROIDS_FILE = os.path.join("./embeddings", "centroids.npz")
+NUM_CENTROIDS = int(os.getenv("RELEVANCE_CENTROIDS", "8"))
+# Held-out accuracy is se kam ho toh gate bekaar hai, purana is_relevant_query() hi chalega
+MIN_GATE_ACCURACY = float(os.getenv("RELEVANCE_GATE_MIN_ACCURACY", "0.85"))
+# Calibration examples kitne hisson mein baante (har hissa ek baar held-out rehta hai)
+CALIBRATION_FOLDS = int(os.getenv("RELEVANCE_CALIBRATION_FOLDS", "4"))
+
+# Calibration ke liye sawaal jo chunks mein seedhe nahi hain (held-out), GBU wale aur bilkul bakwas wale
+IN_DOMAIN_EXAMPLES = [
+    "What is the hostel fee at GBU?",
+    "Which companies visit GBU for placements?",
+    "Does the university have a swimming pool?",
+    "How many books are there in the central library?",
+    "How do I reach the campus from Delhi?",
+    "What is the PhD admission process?",
+    "Which sports facilities are available on campus?",
+    "Does GBU have international collaborations?",
+    "What is the eligibility for B.Tech CSE?",
+    "Who is the vice chancellor?",
+    "Are there scholarships for SC/ST students?",
+    "What cultural festivals happen at GBU?",
+    "Is there Wi-Fi in the hostel rooms?",
+    "What programs does the School of Management offer?",
+    "What is the average placement package?",
+    "email of the ICT faculty",
+]
+OFF_TOPIC_EXAMPLES = [
+    "What is the capital of France?",
+    "Write me a poem about love",
+    "How do I bake a chocolate cake?",
+    "Who won the cricket world cup in 2011?",
+    "asdfgh qwerty",
+    "Tell me a joke",
+    "What is the bitcoin price today?",
+    "How to lose weight fast?",
+    "Best movies of 2023",
+    "Explain quantum entanglement",
+    "What's the weather in Mumbai?",
+    "Translate hello to French",
+    "Recipe for butter chicken",
+    "How do I fix my car engine?",
+    "Give me stock tips",
+    "Play some music",
+]
+
+# (centroids, platt_a, platt_b, accuracy); ek saath replace hota hai
+_gate_state = None
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def spherical_kmeans(vectors, k, iterations=25, seed=0):
+    """k-means on the unit sphere (cosine similarity); returns k normalized centroids."""
+    vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+    k = min(k, len(vectors))
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        updated = np.array([
+            vectors[assignment == c].sum(axis=0) if np.any(assignment == c) else centroids[c]
+            for c in range(k)
+        ])
+        updated = _normalize(updated)
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    return centroids
+
+
+def centroid_scores(centroids, embeddings):
+    """Best cosine similarity of each embedding to any corpus centroid."""
+    return np.max(_normalize(np.asarray(embeddings, dtype=np.float32)) @ centroids.T, axis=-1)
+
+
+def fit_platt(scores, labels, iterations=2000, learning_rate=0.5):
+    """1-D logistic regression (Platt scaling) mapping a centroid score to P(in-domain)."""
+    # Scores ek chhoti range mein hote hain, isliye standardize karke fit karte hain
+    mean, std = float(np.mean(scores)), float(np.std(scores)) or 1.0
+    x = (scores - mean) / std
+    a, b = 1.0, 0.0
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(-(a * x + b)))
+        a -= learning_rate * float(np.mean((p - labels) * x))
+        b -= learning_rate * float(np.mean(p - labels))
+    return a / std, b - a * mean / std
+
+
+def platt_probability(score, platt_a, platt_b):
+    return 1 / (1 + np.exp(-(platt_a * score + platt_b)))
+
+
+def held_out_accuracy(scores, labels, folds=CALIBRATION_FOLDS):
+    """
+    Balanced accuracy of the confidence >= 0.5 decision, each example predicted by
+    a Platt fit that did not see it (k-fold cross-validation).
+    """
+    fold_of = np.arange(len(scores)) % max(2, folds)
+    predicted = np.zeros(len(scores), dtype=bool)
+    for fold in np.unique(fold_of):
+        train = fold_of != fold
+        if len(np.unique(labels[train])) < 2:
+            return 0.0
+        platt_a, platt_b = fit_platt(scores[train], labels[train])
+        predicted[~train] = platt_probability(scores[~train], platt_a, platt_b) >= 0.5
+    positive = labels == 1
+    return float((np.mean(predicted[positive]) + np.mean(~predicted[~positive])) / 2)
+
+
+def build_relevance_gate(chunk_embeddings, embed_fn, path=CENTROIDS_FILE):
+    """
+    Cluster the chunk embeddings, calibrate P(in-domain) on the example questions and save the gate.
+    The saved accuracy is measured on held-out folds; gate_query ignores the gate when it is too low.
+    """
+    global _gate_state
+    try:
+        centroids = spherical_kmeans(chunk_embeddings, NUM_CENTROIDS)
+
+        examples = IN_DOMAIN_EXAMPLES + OFF_TOPIC_EXAMPLES
+        labels = np.array([1.0] * len(IN_DOMAIN_EXAMPLES) + [0.0] * len(OFF_TOPIC_EXAMPLES))
+        embedded = [(e, label) for e, label in zip(embed_fn(examples), labels) if e is not None]
+        if not embedded or len({label for _, label in embedded}) < 2:
+            print("⚠️ Relevance gate calibration skipped: examples could not be embedded")
+            return False
+        scores = centroid_scores(centroids, [e for e, _ in embedded])
+        labels = np.array([label for _, label in embedded])
+
+        accuracy = held_out_accuracy(scores, labels)
+        # Final gate saare examples pe fit; decision wahi hai jo confidence kehta hai (>= 0.5)
+        platt_a, platt_b = fit_platt(scores, labels)
+
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, centroids=centroids, platt=np.array([platt_a, platt_b]), accuracy=accuracy)
+        os.replace(tmp_path, path)
+        _gate_state = (centroids, platt_a, platt_b, accuracy)
+        cutoff = -platt_b / platt_a if platt_a else float("nan")
+        print(f"🎯 Relevance gate ready: {len(centroids)} centroids, score cutoff {cutoff:.3f}, held-out accuracy {accuracy:.2f}")
+        if accuracy < MIN_GATE_ACCURACY:
+            print(f"⚠️ Relevance gate accuracy below {MIN_GATE_ACCURACY:.2f}, keeping the retrieval-based relevance check")
+        return True
+    except Exception as e:
+        print(f"⚠️ Relevance gate build failed: {str(e)}")
+        return False
+
+
+def load_relevance_gate(path=CENTROIDS_FILE):
+    global _gate_state
+    try:
+        with np.load(path) as data:
+            platt_a, platt_b = (float(v) for v in data["platt"])
+            _gate_state = (data["centroids"], platt_a, platt_b, float(data["accuracy"]))
+        return True
+    except (OSError, KeyError, ValueError):
+        return False
+
+
+def gate_query(query_embedding, min_accuracy=MIN_GATE_ACCURACY):
+    """
+    Return (is_relevant, confidence) from a few dot products against the corpus
+    centroids, or None when no calibrated gate is available yet or its held-out
+    accuracy is below min_accuracy. is_relevant is simply confidence >= 0.5.
+    """
+    state = _gate_state
+    if state is None and load_relevance_gate():
+        state = _gate_state
+    if state is None or query_embedding is None:
+        return None
+    centroids, platt_a, platt_b, accuracy = state
+    if accuracy < min_accuracy:
+        return None
+    score = float(centroid_scores(centroids, [query_embedding])[0])
+    confidence = float(platt_probability(score, platt_a, platt_b))
+    return confidence >= 0.5, confidence
@@ -0,0 +1,127 @@
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from context_packer import count_tokens, GENERATION_NUM_CTX, ANSWER_TOKEN_RESERVE
+
+# Kitne sessions ek saath yaad rakhenge aur kitni der idle rehne ke baad bhool jayenge
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "256"))
+SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL", "1800"))
+# Follow-up pe naya context itne tokens tak hi; chhota rakhne se hi session ka prefill bachta hai
+FOLLOW_UP_TOKEN_BUDGET = int(os.getenv("CHAT_FOLLOW_UP_TOKEN_BUDGET", "256"))
+# num_ctx mein itni jagah bhi na bache toh Ollama shuru ka system prompt kaat dega, isliye session taaza shuru karo
+MIN_FOLLOW_UP_TOKENS = int(os.getenv("CHAT_MIN_FOLLOW_UP_TOKENS", "96"))
+SESSION_MAX_TURNS = int(os.getenv("CHAT_SESSION_MAX_TURNS", "6"))
+# "Additional context:" / "Question:" / "Answer:" wale headers
+_FOLLOW_UP_OVERHEAD_TOKENS = 16
+# Gate ne reject kiya ho toh bhi follow-up tabhi jaane do jab confidence is se upar ho ya sawaal chhota aur "uska/it" wala ho
+FOLLOW_UP_MIN_CONFIDENCE = float(os.getenv("CHAT_FOLLOW_UP_MIN_CONFIDENCE", "0.25"))
+FOLLOW_UP_MAX_WORDS = int(os.getenv("CHAT_FOLLOW_UP_MAX_WORDS", "8"))
+
+_ANAPHORA = {
+    "it", "its", "that", "this", "these", "those", "they", "them", "their", "there",
+    "he", "she", "him", "his", "her", "same",
+    "uska", "uski", "uske", "unka", "unki", "unke", "iska", "iski", "iske", "wahan", "woh", "aur",
+}
+
+
+def is_anaphoric_follow_up(prompt, max_words=FOLLOW_UP_MAX_WORDS):
+    """Short question that leans on the previous turn ("and its fee?", "aur uski hostel fee?")."""
+    words = re.findall(r"[a-z']+", prompt.lower())
+    return 0 < len(words) <= max_words and any(word in _ANAPHORA for word in words)
+
+
+class SessionStore:
+    """
+    Bounded in-memory store of chat sessions with idle TTL and LRU eviction.
+
+    Each session keeps the `context` token state returned by ollama.generate and
+    the context sentences already sent to the model, so follow-up turns only carry new text.
+    A follow-up only gets the room left in num_ctx after the stored context and the
+    answer reserve (at most follow_up_tokens); when that room is too small, or after
+    max_turns, the session is reset and the next turn sends the full prompt again.
+    Sessions live in this process only; with several workers, requests must be routed
+    by session id (see README).
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL_SECONDS, max_turns=SESSION_MAX_TURNS,
+                 num_ctx=GENERATION_NUM_CTX, answer_reserve=ANSWER_TOKEN_RESERVE,
+                 follow_up_tokens=FOLLOW_UP_TOKEN_BUDGET, min_follow_up_tokens=MIN_FOLLOW_UP_TOKENS):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.num_ctx = num_ctx
+        self.answer_reserve = answer_reserve
+        self.follow_up_tokens = follow_up_tokens
+        self.min_follow_up_tokens = min_follow_up_tokens
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        # OrderedDict LRU order mein hai, toh purane wale shuru mein milenge
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session["last_used"] <= self.ttl:
+                break
+            del self._sessions[session_id]
+
+    def get_or_create(self, session_id=None):
+        """Return (session_id, session), creating a fresh session when the id is unknown or expired."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session_id = session_id or uuid.uuid4().hex
+                session = {"context": None, "seen_sentences": set(), "turns": 0, "last_used": now}
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            session["last_used"] = now
+            self._sessions.move_to_end(session_id)
+            return session_id, session
+
+    def _room(self, llm_context, question_tokens=0):
+        return self.num_ctx - len(llm_context) - self.answer_reserve - _FOLLOW_UP_OVERHEAD_TOKENS - question_tokens
+
+    def reset(self, session):
+        session.update(context=None, seen_sentences=set(), turns=0)
+
+    def follow_up_budget(self, session, prompt):
+        """
+        Token budget for new context on a follow-up turn, checked before anything is sent.
+        Returns None (after resetting the session) when the turn must start over with the full prompt.
+        """
+        if not session["context"]:
+            return None
+        room = self._room(session["context"], count_tokens(prompt))
+        if room < self.min_follow_up_tokens:
+            print(f"♻️ Session context reset: only {room} tokens left of num_ctx {self.num_ctx}")
+            self.reset(session)
+            return None
+        return min(self.follow_up_tokens, room)
+
+    def record_turn(self, session, llm_context):
+        """Store the context returned by a generation; reset the session when no follow-up would fit."""
+        session["turns"] += 1
+        if not llm_context or session["turns"] >= self.max_turns or self._room(llm_context) < self.min_follow_up_tokens:
+            if llm_context:
+                print(f"♻️ Session context reset after {session['turns']} turns ({len(llm_context)} tokens)")
+            self.reset(session)
+            return False
+        session["context"] = llm_context
+        return True
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+session_store = SessionStore()
@@ -0,0 +1,199 @@
+import json
+import os
+
+import numpy as np
+
+from deployment import MULTI_WORKER
+
+COMPACT_STORE_PATH = os.path.join("./embeddings", "compact")
+# "chroma" = purana HNSW collection, "float16"/"int8" = compact numpy store with float32 rescoring
+VECTOR_STORE_MODE = os.getenv("VECTOR_STORE_MODE", "chroma").lower()
+# Quantized search se kitne candidates nikal ke float32 mein dobara score karenge
+RESCORE_CANDIDATES = int(os.getenv("VECTOR_RESCORE_CANDIDATES", "20"))
+# Quantized matrix ko itni rows ke block mein float32 banake score karte hain, poori matrix ki float32 copy kabhi nahi banti
+SCORE_BLOCK_ROWS = int(os.getenv("VECTOR_SCORE_BLOCK_ROWS", "1024"))
+CHROMA_PATH = "./embeddings"
+
+_FILES = {
+    "float32": "vectors_f32.npy",
+    "float16": "vectors_f16.npy",
+    "int8": "vectors_i8.npy",
+}
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def quantize_int8(matrix):
+    """Symmetric per-vector int8 quantization. Returns (int8 matrix, float32 scales)."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def _save_atomic(file_path, array):
+    # Workers in files ko mmap karke padh rahe ho sakte hain, isliye jagah pe overwrite nahi, replace
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        np.save(file, array)
+    os.replace(tmp_path, file_path)
+
+
+def build_compact_store(embeddings, documents, path=COMPACT_STORE_PATH):
+    """Write normalized float32, float16 and int8 copies of the chunk embeddings next to the Chroma collection."""
+    os.makedirs(path, exist_ok=True)
+    full = _normalize(np.asarray(embeddings, dtype=np.float32))
+    quantized, scales = quantize_int8(full)
+
+    _save_atomic(os.path.join(path, _FILES["float32"]), full)
+    _save_atomic(os.path.join(path, _FILES["float16"]), full.astype(np.float16))
+    _save_atomic(os.path.join(path, _FILES["int8"]), quantized)
+    _save_atomic(os.path.join(path, "scales_i8.npy"), scales)
+    tmp_path = os.path.join(path, "documents.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(documents, file)
+    os.replace(tmp_path, os.path.join(path, "documents.json"))
+    print(f"🗜️ Compact vector store written: {len(documents)} vectors")
+
+
+class CompactVectorStore:
+    """
+    Quantized (float16 or int8) vectors kept in RAM for the candidate search,
+    with exact float32 rescoring of the top candidates from a memory-mapped file.
+    With mmap=True the quantized vectors are memory-mapped too, so worker
+    processes share the same page-cache pages instead of each holding a copy.
+    """
+
+    def __init__(self, path=COMPACT_STORE_PATH, mode="int8", mmap=False):
+        if mode not in ("float16", "int8"):
+            raise ValueError(f"Unknown compact vector store mode: {mode}")
+        self.path = path
+        self.mode = mode
+        mmap_mode = "r" if mmap else None
+        self.vectors = np.load(os.path.join(path, _FILES[mode]), mmap_mode=mmap_mode)
+        self.scales = np.load(os.path.join(path, "scales_i8.npy"), mmap_mode=mmap_mode) if mode == "int8" else None
+        # float32 copy disk pe hi rehta hai, sirf rescoring wali rows page-in hoti hain
+        self.full = np.load(os.path.join(path, _FILES["float32"]), mmap_mode="r")
+        with open(os.path.join(path, "documents.json"), "r", encoding="utf-8") as file:
+            self.documents = json.load(file)
+
+    def _candidate_scores(self, query, block_rows=SCORE_BLOCK_ROWS):
+        # int8 @ float32 pe numpy poori matrix ki float32 copy bana deta hai; block-wise cast se temporary chhota rehta hai
+        scores = np.empty(len(self.vectors), dtype=np.float32)
+        buffer = np.empty((min(block_rows, len(self.vectors)), self.vectors.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.vectors), block_rows):
+            rows = self.vectors[start:start + block_rows]
+            block = buffer[:len(rows)]
+            np.copyto(block, rows, casting="unsafe")
+            np.matmul(block, query, out=scores[start:start + len(rows)])
+        if self.mode == "int8":
+            scores *= self.scales
+        return scores
+
+    def query(self, query_embeddings, n_results=3, candidates=RESCORE_CANDIDATES):
+        """Chroma-shaped results: {"documents": [[...]], "distances": [[...]]} with cosine distances."""
+        all_documents, all_distances = [], []
+        for query_embedding in query_embeddings:
+            query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+            scores = self._candidate_scores(query)
+
+            k = min(max(candidates, n_results), len(scores))
+            if k == 0:
+                all_documents.append([])
+                all_distances.append([])
+                continue
+            # Sorted ids se mmap pe reads sequential rehte hain
+            candidate_ids = np.sort(np.argpartition(-scores, k - 1)[:k])
+
+            exact = np.asarray(self.full[candidate_ids]) @ query
+            order = np.argsort(-exact)[:n_results]
+            top_ids = candidate_ids[order]
+            all_documents.append([self.documents[i] for i in top_ids])
+            all_distances.append([float(1 - exact[j]) for j in order])
+        return {"documents": all_documents, "distances": all_distances}
+
+    def stats(self):
+        return storage_stats(self.path)
+
+
+def _chroma_stats(chroma_path):
+    # hnswlib poora HNSW segment (vectors + graph) RAM mein rakhta hai; sqlite sirf disk pe
+    hnsw_bytes, disk = 0, 0
+    for root, _, files in os.walk(chroma_path):
+        if os.path.abspath(root).startswith(os.path.abspath(COMPACT_STORE_PATH)):
+            continue
+        for name in files:
+            size = os.path.getsize(os.path.join(root, name))
+            if name.endswith(".bin") or name == "index_metadata.pickle":
+                hnsw_bytes += size
+                disk += size
+            elif name.startswith("chroma.sqlite3"):
+                disk += size
+    return {"memory_bytes": hnsw_bytes, "disk_bytes": disk}
+
+
+def storage_stats(path=COMPACT_STORE_PATH, chroma_path=CHROMA_PATH, block_rows=SCORE_BLOCK_ROWS, candidates=RESCORE_CANDIDATES):
+    """
+    Resident memory and disk bytes for each VECTOR_STORE_MODE.
+
+    memory_bytes is what stays resident between queries: the HNSW index for chroma, the
+    quantized vectors for float16/int8 (shared page cache when memory-mapped). The float32
+    file is only read for rescoring, so it counts towards disk_bytes and query_peak_bytes
+    (one float32 scoring block plus the rescored rows), not memory_bytes.
+    """
+    stats = {"chroma": _chroma_stats(chroma_path)}
+    full_path = os.path.join(path, _FILES["float32"])
+    if not os.path.exists(full_path):
+        return stats
+    full = np.load(full_path, mmap_mode="r")
+    count, dim = (int(n) for n in full.shape)
+    stats["chroma"].update(vectors=count, dim=dim)
+    for mode in ("float16", "int8"):
+        file_path = os.path.join(path, _FILES[mode])
+        if not os.path.exists(file_path):
+            continue
+        resident = np.load(file_path, mmap_mode="r").nbytes
+        disk = os.path.getsize(file_path) + os.path.getsize(full_path)
+        if mode == "int8":
+            scales_path = os.path.join(path, "scales_i8.npy")
+            resident += np.load(scales_path, mmap_mode="r").nbytes
+            disk += os.path.getsize(scales_path)
+        stats[mode] = {
+            "vectors": count,
+            "dim": dim,
+            "memory_bytes": int(resident),
+            "disk_bytes": int(disk),
+            "query_peak_bytes": int((min(block_rows, count) + min(candidates, count)) * dim * 4 + count * 4),
+            "shared": MULTI_WORKER,
+        }
+    return stats
+
+
+_compact_store = None
+
+
+def get_compact_store(mode=VECTOR_STORE_MODE):
+    """Load the compact store once for the configured mode; None when mode is "chroma" or the store is missing."""
+    global _compact_store
+    if mode == "chroma":
+        return None
+    if _compact_store is None or _compact_store.mode != mode:
+        try:
+            _compact_store = CompactVectorStore(mode=mode, mmap=MULTI_WORKER)
+            mode_stats = _compact_store.stats()
+            for name, entry in mode_stats.items():
+                print(f"🗜️ {name}: {entry['memory_bytes'] / 1024:.1f} KB RAM, {entry['disk_bytes'] / 1024:.1f} KB disk")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Compact vector store unavailable, falling back to Chroma: {str(e)}")
+            return None
+    return _compact_store
+
+
+def reset_compact_store():
+    """Forget the loaded store so the next query picks up a freshly built one."""
+    global _compact_store
+    _compact_store = None